@@ -1,8 +1,33 @@
 
-import json
-from typing import List, Dict, Tuple
+from typing import List, Dict, Set, Tuple
 from pathlib import Path
 
+import orjson
+
+
+def _cmp_float(gt_value, out_value) -> bool:
+    """Numbers: exact match after rounding to 2 decimals; other types compared directly."""
+    # Handle null comparisons
+    if gt_value is None or out_value is None:
+        return gt_value is None and out_value is None
+    if isinstance(gt_value, (int, float)) and isinstance(out_value, (int, float)):
+        return round(float(gt_value), 2) == round(float(out_value), 2)
+    return gt_value == out_value
+
+
+def _cmp_str(gt_value, out_value) -> bool:
+    """Strings (already trimmed and lowercased): direct match; other types as _cmp_float."""
+    if isinstance(gt_value, str) and isinstance(out_value, str):
+        return gt_value == out_value
+    return _cmp_float(gt_value, out_value)
+
+
+def _cmp_bool(gt_value, out_value) -> bool:
+    """Booleans: direct match; other types as _cmp_float."""
+    if isinstance(gt_value, bool) and isinstance(out_value, bool):
+        return gt_value is out_value
+    return _cmp_float(gt_value, out_value)
+
 
 class ExtractionEvaluator:
     """Evaluates extraction accuracy against ground truth."""
@@ -19,6 +44,19 @@ class ExtractionEvaluator:
         'is_dangerous'
     ]
     
+    # Field types are fixed by the schema, so pick each comparator up front
+    _FIELD_COMPARATORS = {
+        'product_line': _cmp_str,
+        'origin_port_code': _cmp_str,
+        'origin_port_name': _cmp_str,
+        'destination_port_code': _cmp_str,
+        'destination_port_name': _cmp_str,
+        'incoterm': _cmp_str,
+        'cargo_weight_kg': _cmp_float,
+        'cargo_cbm': _cmp_float,
+        'is_dangerous': _cmp_bool,
+    }
+    
     def __init__(self, ground_truth_path: str, output_path: str):
         """
         Initialize evaluator with ground truth and output data.
@@ -45,44 +83,53 @@ class ExtractionEvaluator:
                 print(f"⚠ Warning: Missing IDs in output: {missing_in_output}")
             if extra_in_output:
                 print(f"⚠ Warning: Extra IDs in output: {extra_in_output}")
+        
+        # Normalize strings once so comparisons don't re-strip/re-lowercase
+        self._gt_norm = {email_id: self._normalize(item) for email_id, item in self.gt_lookup.items()}
+        self._out_norm = {email_id: self._normalize(item) for email_id, item in self.out_lookup.items()}
     
     def _load_json(self, filepath: str) -> List[Dict]:
         """Load JSON file."""
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        return orjson.loads(Path(filepath).read_bytes())
     
-    def _compare_values(self, gt_value, out_value, field_name: str) -> bool:
+    def _normalize(self, item: Dict) -> Dict:
+        """Evaluated fields of item, with strings trimmed and lowercased."""
+        norm = {}
+        for field in self.EVALUATED_FIELDS:
+            value = item.get(field)
+            norm[field] = value.strip().lower() if isinstance(value, str) else value
+        return norm
+    
+    def _score(self, fields: List[str]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
         """
-        Compare two values with field-specific rules.
+        Compare several fields across all emails in one pass.
         
         Args:
-            gt_value: Ground truth value
-            out_value: Output value
-            field_name: Name of field being compared
+            fields: Names of fields being compared
             
         Returns:
-            True if values match, False otherwise
+            Tuple of (correct count per field, incorrect IDs per field)
         """
-        # Handle null comparisons
-        if gt_value is None and out_value is None:
-            return True
-        if gt_value is None or out_value is None:
-            return False
-        
-        # String comparisons: case-insensitive, whitespace trimmed
-        if isinstance(gt_value, str) and isinstance(out_value, str):
-            return gt_value.strip().lower() == out_value.strip().lower()
-        
-        # Float comparisons: exact match after rounding to 2 decimals
-        if isinstance(gt_value, (int, float)) and isinstance(out_value, (int, float)):
-            return round(float(gt_value), 2) == round(float(out_value), 2)
+        comparators = [(field, self._FIELD_COMPARATORS[field]) for field in fields]
+        correct = dict.fromkeys(fields, 0)
+        incorrect_ids = {field: [] for field in fields}
         
-        # Boolean comparisons
-        if isinstance(gt_value, bool) and isinstance(out_value, bool):
-            return gt_value == out_value
+        for email_id, gt_item in self._gt_norm.items():
+            out_item = self._out_norm.get(email_id)
+            
+            # Emails missing from the output are wrong for every field
+            if out_item is None:
+                for field in fields:
+                    incorrect_ids[field].append(email_id)
+                continue
+            
+            for field, cmp in comparators:
+                if cmp(gt_item[field], out_item[field]):
+                    correct[field] += 1
+                else:
+                    incorrect_ids[field].append(email_id)
         
-        # Fallback: direct comparison
-        return gt_value == out_value
+        return correct, incorrect_ids
     
     def evaluate_field(self, field_name: str) -> Tuple[int, int, List[str]]:
         """
@@ -94,29 +141,18 @@ class ExtractionEvaluator:
         Returns:
             Tuple of (correct_count, total_count, incorrect_ids)
         """
-        correct = 0
-        total = 0
-        incorrect_ids = []
-        
-        for email_id in self.gt_lookup.keys():
-            if email_id not in self.out_lookup:
-                total += 1
-                incorrect_ids.append(email_id)
-                continue
-            
-            gt_item = self.gt_lookup[email_id]
-            out_item = self.out_lookup[email_id]
-            
-            gt_value = gt_item.get(field_name)
-            out_value = out_item.get(field_name)
-            
-            total += 1
-            if self._compare_values(gt_value, out_value, field_name):
-                correct += 1
-            else:
-                incorrect_ids.append(email_id)
+        correct, incorrect_ids = self._score([field_name])
+        return correct[field_name], len(self.gt_lookup), incorrect_ids[field_name]
+    
+    def passing_ids(self) -> Set[str]:
+        """
+        Find emails whose evaluated fields are all correct.
         
-        return correct, total, incorrect_ids
+        Returns:
+            Set of email IDs with every field matching ground truth
+        """
+        _, incorrect_ids = self._score(self.EVALUATED_FIELDS)
+        return set(self.gt_lookup.keys()).difference(*incorrect_ids.values())
     
     def evaluate_all(self) -> Dict[str, Dict]:
         """
@@ -129,15 +165,19 @@ class ExtractionEvaluator:
         total_correct = 0
         total_fields = 0
         
+        # Compare every field in a single pass, then summarize per field
+        correct_counts, incorrect = self._score(self.EVALUATED_FIELDS)
+        total = len(self.gt_lookup)
+        
         for field in self.EVALUATED_FIELDS:
-            correct, total, incorrect_ids = self.evaluate_field(field)
+            correct = correct_counts[field]
             accuracy = (correct / total * 100) if total > 0 else 0
             
             results[field] = {
                 'correct': correct,
                 'total': total,
                 'accuracy': accuracy,
-                'incorrect_ids': incorrect_ids
+                'incorrect_ids': incorrect[field]
             }
             
             total_correct += correct
@@ -1,16 +1,28 @@
 
-import json
+import asyncio
 import os
+import sys
 import time
-import re
-from typing import List, Dict, Optional
+from collections import deque
+from hashlib import blake2b
+from typing import List, Dict, Iterable, Iterator, Optional, Sized, Tuple
 from pathlib import Path
 
-from groq import Groq
+import httpx
+import ijson
+import orjson
+from groq import AsyncGroq
 from pydantic import ValidationError
 
-from schemas import EmailInput, ShipmentExtraction, PortReference
-from prompts import get_current_prompt, format_prompt, get_port_reference_text
+from schemas import EmailInput, ShipmentExtraction
+from llm_cache import FileCache, cache_key, salient_tokens
+from prompts import (
+    get_current_prompt,
+    format_system_prompt,
+    format_user_prompt,
+    format_batch_user_prompt,
+    prepare_ports,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,42 +35,189 @@ TEMPERATURE = 0  # Required for reproducibility
 MAX_RETRIES = 3
 INITIAL_RETRY_DELAY = 2  # seconds
 MAX_RETRY_DELAY = 30  # seconds
+MAX_CONCURRENT_REQUESTS = 8  # In-flight API requests (tune to Groq tier RPM)
+REQUESTS_PER_MINUTE = 30  # Groq tier request limit
+RATE_WINDOW = 60  # seconds
+CACHE_DIR = "cache"  # On-disk extraction cache (only used when TEMPERATURE == 0)
+MICRO_BATCH_SIZE = 5  # Emails sent per LLM request (1 = one email per request)
+MAX_TOKENS_PER_EMAIL = 1000
+LOG_FLUSH_EVERY = 10  # Status lines buffered before writing to stdout
+NEAR_DUPLICATE_CACHE = False  # Also reuse results for emails with the same salient words
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} object in text, or None.
+    
+    Single left-to-right scan tracking brace depth; braces inside string
+    literals (including escaped quotes) are ignored.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 
 class EmailExtractor:
     """Handles LLM-based extraction from freight forwarding emails."""
     
-    def __init__(self, api_key: str, port_references: List[Dict[str, str]]):
+    def __init__(
+        self,
+        api_key: str,
+        port_references: List[Dict[str, str]],
+        cache_dir: Optional[str] = CACHE_DIR,
+        prompt_template: Optional[str] = None,
+        near_duplicate_cache: bool = NEAR_DUPLICATE_CACHE
+    ):
         """
         Initialize extractor with Groq API client and port reference data.
         
         Args:
             api_key: Groq API key
             port_references: List of port code mappings
+            cache_dir: Directory for cached extractions, or None to disable
+            prompt_template: System prompt template overriding the current
+                version (see set_prompt)
+            near_duplicate_cache: Also reuse results for emails that differ
+                only in case, punctuation or filler words
         """
-        self.client = Groq(api_key=api_key)
-        self.port_references = [PortReference(**p) for p in port_references]
-        self.port_reference_text = get_port_reference_text(port_references)
-        self.prompt_template = get_current_prompt()
+        # Keep one warm HTTP/2 connection per concurrent request slot
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=0,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENT_REQUESTS,
+                max_keepalive_connections=MAX_CONCURRENT_REQUESTS
+            )
+        )
+        http_client = httpx.AsyncClient(transport=transport)
+        self.client = AsyncGroq(api_key=api_key, http_client=http_client)
+        
+        # Port lookups for post-processing and reference text for the prompt
+        self.port_lookup, self.port_code_by_name, self.port_reference_text = (
+            prepare_ports(port_references)
+        )
+        self.port_lookup[None] = None  # null code -> null name
+        
+        # Prompt tokens billed vs. served from the provider's prefix cache
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
         
-        # Create port lookup for post-processing
-        self.port_lookup = self._build_port_lookup(port_references)
+        # Sliding-window rate limiter shared across concurrent requests
+        self._request_times = deque()
+        
+        # Per-email status lines, written to stdout in chunks
+        self._log_lines: List[str] = []
+        
+        # Previously extracted results; only deterministic calls are cacheable
+        self._cache = FileCache(cache_dir) if cache_dir and TEMPERATURE == 0 else None
+        self._near_duplicate_cache = near_duplicate_cache
+        
+        self.set_prompt(prompt_template)
     
-    def _build_port_lookup(self, port_references: List[Dict[str, str]]) -> Dict[str, str]:
+    def set_prompt(self, prompt_template: Optional[str] = None):
         """
-        Build lookup dictionary for port code to canonical name.
-        Uses first occurrence of each code as canonical.
+        Switch the system prompt used for subsequent extractions.
+        
+        The client, rate limiter and caches are kept; cache keys include a
+        digest of the system prompt, so results from another prompt (or
+        other port reference data) are never reused.
+        
+        Args:
+            prompt_template: System prompt template, or None for the current version
         """
-        lookup = {}
-        for port in port_references:
-            code = port['code']
-            if code not in lookup:
-                lookup[code] = port['name']
-        return lookup
+        self.prompt_template = prompt_template or get_current_prompt()
+        
+        # Static prefix sent as the system message on every call. It must stay
+        # byte-identical (no IDs, timestamps) so Groq's prompt cache can reuse it
+        self.system_prompt = format_system_prompt(self.prompt_template, self.port_reference_text)
+        self._prompt_digest = cache_key({"system_prompt": self.system_prompt})
+    
+    async def aclose(self):
+        """Close the underlying HTTP connections."""
+        await self.client.close()
+    
+    def _log(self, line: str):
+        """Buffer a status line, flushing every LOG_FLUSH_EVERY lines."""
+        self._log_lines.append(line + "\n")
+        if len(self._log_lines) >= LOG_FLUSH_EVERY:
+            self._flush_log()
+    
+    def _flush_log(self):
+        """Write buffered status lines to stdout in one call."""
+        if self._log_lines:
+            sys.stdout.write("".join(self._log_lines))
+            sys.stdout.flush()
+            self._log_lines.clear()
+    
+    def _cache_key(self, email: EmailInput) -> str:
+        """Key on everything that determines the LLM output for an email."""
+        return cache_key({
+            "model": GROQ_MODEL,
+            "prompt": self._prompt_digest,
+            "subject": email.subject,
+            "body": email.body,
+        })
+    
+    def _near_duplicate_key(self, email: EmailInput) -> str:
+        """Key on the email's salient words, so templated resends with the same figures collide."""
+        return cache_key({
+            "model": GROQ_MODEL,
+            "prompt": self._prompt_digest,
+            "tokens": sorted(salient_tokens(f"{email.subject}\n{email.body}")),
+        })
+    
+    @staticmethod
+    def _content_hash(email: EmailInput) -> bytes:
+        """Fast digest of subject and body for spotting duplicate emails in a batch."""
+        return blake2b(f"{email.subject}\x00{email.body}".encode(), digest_size=16).digest()
+    
+    def _get_cached(self, email: EmailInput) -> Optional[ShipmentExtraction]:
+        """Return the cached extraction for an identical or near-duplicate email, relabelled with its ID."""
+        if self._cache is None:
+            return None
+        cached = self._cache.get(self._cache_key(email))
+        if cached is None and self._near_duplicate_cache:
+            cached = self._cache.get(self._near_duplicate_key(email))
+        if cached is None:
+            return None
+        return ShipmentExtraction.model_validate({**cached, 'id': email.id})
+    
+    def _store_cached(self, email: EmailInput, extraction: ShipmentExtraction):
+        """Remember a successful extraction for identical and near-duplicate emails."""
+        if self._cache is not None:
+            value = extraction.model_dump(exclude={'id'})
+            self._cache.set(self._cache_key(email), value)
+            if self._near_duplicate_cache:
+                self._cache.set(self._near_duplicate_key(email), value)
     
     def _extract_json_from_response(self, response_text: str) -> Optional[Dict]:
         """
-        Extract JSON from LLM response, handling markdown code blocks.
+        Parse the JSON object returned by the LLM.
+        
+        Requests are made in JSON mode, so the response body is normally bare
+        JSON; if not, the first balanced object in the text is used instead.
         
         Args:
             response_text: Raw LLM response
@@ -66,30 +225,48 @@ class EmailExtractor:
         Returns:
             Parsed JSON dict or None if parsing fails
         """
-        # Try to find JSON in markdown code blocks
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find raw JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
+        try:
+            data = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            json_str = _find_json_object(response_text)
+            if json_str is None:
+                return None
+            try:
+                data = orjson.loads(json_str)
+            except orjson.JSONDecodeError:
                 return None
+        return data if isinstance(data, dict) else None
+    
+    async def throttle(self):
+        """
+        Wait until a request slot is free under REQUESTS_PER_MINUTE.
         
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            return None
+        Requests go out immediately while below the limit; once the window
+        is full, wait until the oldest request ages out of it. The check and
+        append run without an await in between, so no lock is needed.
+        """
+        while True:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= RATE_WINDOW:
+                self._request_times.popleft()
+            if len(self._request_times) < REQUESTS_PER_MINUTE:
+                self._request_times.append(now)
+                return
+            await asyncio.sleep(self._request_times[0] + RATE_WINDOW - now)
     
-    def _call_llm_with_retry(self, prompt: str, model: str) -> Optional[str]:
+    async def _call_llm_with_retry(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int = MAX_TOKENS_PER_EMAIL
+    ) -> Optional[str]:
         """
         Call Groq LLM with exponential backoff retry logic.
         
         Args:
-            prompt: Formatted prompt
+            prompt: Formatted user message
             model: Model name to use
+            max_tokens: Completion token limit
             
         Returns:
             LLM response text or None if all retries fail
@@ -98,12 +275,13 @@ class EmailExtractor:
         
         for attempt in range(MAX_RETRIES):
             try:
-                response = self.client.chat.completions.create(
+                await self.throttle()
+                response = await self.client.chat.completions.create(
                     model=model,
                     messages=[
                         {
                             "role": "system",
-                            "content": "You are an expert at extracting structured data from freight forwarding emails. Always return valid JSON."
+                            "content": self.system_prompt
                         },
                         {
                             "role": "user",
@@ -111,25 +289,32 @@ class EmailExtractor:
                         }
                     ],
                     temperature=TEMPERATURE,
-                    max_tokens=1000
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"}
                 )
+                if response.usage is not None:
+                    self.prompt_tokens += response.usage.prompt_tokens
+                    details = response.usage.prompt_tokens_details
+                    if details is not None:
+                        self.cached_prompt_tokens += details.cached_tokens
                 return response.choices[0].message.content
             
             except Exception as e:
                 error_msg = str(e)
-                print(f"  ⚠ Attempt {attempt + 1}/{MAX_RETRIES} failed: {error_msg[:100]}")
+                self._log(f"  ⚠ Attempt {attempt + 1}/{MAX_RETRIES} failed: {error_msg[:100]}")
                 
                 # Check if it's a rate limit error
                 if "rate_limit" in error_msg.lower() or "429" in error_msg:
                     if attempt < MAX_RETRIES - 1:
-                        print(f"  ⏳ Rate limited, waiting {retry_delay}s...")
-                        time.sleep(retry_delay)
+                        self._log(f"  ⏳ Rate limited, waiting {retry_delay}s...")
+                        self._flush_log()
+                        await asyncio.sleep(retry_delay)
                         retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
                         continue
                 
                 # For other errors, retry with shorter delay
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(1)
+                    await asyncio.sleep(1)
                     continue
                 
                 return None
@@ -147,55 +332,64 @@ class EmailExtractor:
         Returns:
             Validated and fixed extraction data
         """
-        # Ensure port names match canonical names from reference
-        if raw_data.get('origin_port_code') in self.port_lookup:
-            raw_data['origin_port_name'] = self.port_lookup[raw_data['origin_port_code']]
-        
-        if raw_data.get('destination_port_code') in self.port_lookup:
-            raw_data['destination_port_name'] = self.port_lookup[raw_data['destination_port_code']]
-        
-        # Ensure null consistency: if code is null, name should be null
-        if raw_data.get('origin_port_code') is None:
-            raw_data['origin_port_name'] = None
-        if raw_data.get('destination_port_code') is None:
-            raw_data['destination_port_name'] = None
+        for code_key, name_key in (
+            ('origin_port_code', 'origin_port_name'),
+            ('destination_port_code', 'destination_port_name'),
+        ):
+            # Intern returned codes so lookups hit the interned reference keys
+            code = raw_data.get(code_key)
+            if isinstance(code, str):
+                code = raw_data[code_key] = sys.intern(code)
+            
+            # Code not in the reference: recover it from an exact port name match
+            if code not in self.port_lookup:
+                name = raw_data.get(name_key)
+                if isinstance(name, str) and name.casefold() in self.port_code_by_name:
+                    code = raw_data[code_key] = self.port_code_by_name[name.casefold()]
+            
+            # One lookup per side: known codes get the canonical name, a null
+            # code hits the None entry (null name), unknown codes keep theirs
+            raw_data[name_key] = self.port_lookup.get(code, raw_data.get(name_key))
         
         # Add email ID
         raw_data['id'] = email_id
         
         return raw_data
     
-    def extract_single_email(self, email: EmailInput) -> ShipmentExtraction:
+    async def extract_single_email(self, email: EmailInput, prefix: str = "") -> ShipmentExtraction:
         """
         Extract shipment data from a single email.
         
         Args:
             email: Email input data
+            prefix: Progress label prepended to the status line
             
         Returns:
             Validated shipment extraction
         """
-        print(f"Processing {email.id}...", end=" ")
-        
-        # Format prompt
-        prompt = format_prompt(
-            self.prompt_template,
-            email.subject,
-            email.body,
-            self.port_reference_text
-        )
+        # Status is printed as one line so concurrent requests don't interleave
+        label = f"{prefix}Processing {email.id}..."
+        
+        # Identical emails (forwards, re-sends) reuse the earlier extraction
+        cached = self._get_cached(email)
+        if cached is not None:
+            self._log(f"{label} ✓ (cached)")
+            return cached
+        
+        # Format per-email message; rules and port reference live in the system prompt
+        prompt = format_user_prompt(email.subject, email.body)
         
         # Try primary model first
-        response_text = self._call_llm_with_retry(prompt, GROQ_MODEL)
+        response_text = await self._call_llm_with_retry(prompt, GROQ_MODEL)
         
         # If primary fails, try fallback
         if response_text is None:
-            print(f"  ↻ Trying fallback model...", end=" ")
-            response_text = self._call_llm_with_retry(prompt, GROQ_MODEL_FALLBACK)
+            self._log(f"  ↻ {email.id}: trying fallback model...")
+            response_text = await self._call_llm_with_retry(prompt, GROQ_MODEL_FALLBACK)
         
         # If both models fail, return null extraction
         if response_text is None:
-            print("✗ FAILED (all retries exhausted)")
+            self._log(f"{label} ✗ FAILED (all retries exhausted)")
             return ShipmentExtraction(
                 id=email.id,
                 product_line=None,
@@ -213,7 +407,7 @@ class EmailExtractor:
         extracted_data = self._extract_json_from_response(response_text)
         
         if extracted_data is None:
-            print("✗ FAILED (invalid JSON)")
+            self._log(f"{label} ✗ FAILED (invalid JSON)")
             return ShipmentExtraction(
                 id=email.id,
                 product_line=None,
@@ -230,11 +424,12 @@ class EmailExtractor:
         # Validate and fix
         try:
             fixed_data = self._validate_and_fix_extraction(extracted_data, email.id)
-            extraction = ShipmentExtraction(**fixed_data)
-            print("✓")
+            extraction = ShipmentExtraction.model_validate(fixed_data)
+            self._store_cached(email, extraction)
+            self._log(f"{label} ✓")
             return extraction
         except ValidationError as e:
-            print(f"✗ FAILED (validation error: {e})")
+            self._log(f"{label} ✗ FAILED (validation error: {e})")
             return ShipmentExtraction(
                 id=email.id,
                 product_line=None,
@@ -248,57 +443,187 @@ class EmailExtractor:
                 is_dangerous=False
             )
     
-    def extract_batch(self, emails: List[EmailInput]) -> List[ShipmentExtraction]:
+    async def extract_micro_batch(
+        self,
+        emails: List[EmailInput],
+        prefixes: Optional[List[str]] = None
+    ) -> List[ShipmentExtraction]:
         """
-        Extract shipment data from multiple emails.
+        Extract several emails with a single LLM request.
+        
+        The shared system prompt is paid once for the whole group. If the
+        response parses but an email's result is missing or fails validation,
+        that email is retried on its own via extract_single_email. If the API
+        call itself fails on both models, the group gets null extractions.
         
         Args:
-            emails: List of email inputs
+            emails: Email inputs sent together
+            prefixes: Progress labels, one per email
+            
+        Returns:
+            Validated extractions in input order
+        """
+        prefixes = prefixes or [""] * len(emails)
+        results: List[Optional[ShipmentExtraction]] = [self._get_cached(e) for e in emails]
+        for email, prefix, cached in zip(emails, prefixes, results):
+            if cached is not None:
+                self._log(f"{prefix}Processing {email.id}... ✓ (cached)")
+        
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if len(pending) > 1:
+            prompt = format_batch_user_prompt([
+                {'id': emails[i].id, 'subject': emails[i].subject, 'body': emails[i].body}
+                for i in pending
+            ])
+            max_tokens = MAX_TOKENS_PER_EMAIL * len(pending)
+            response_text = await self._call_llm_with_retry(prompt, GROQ_MODEL, max_tokens=max_tokens)
+            
+            if response_text is None:
+                self._log(f"  ↻ Batch of {len(pending)}: trying fallback model...")
+                response_text = await self._call_llm_with_retry(
+                    prompt, GROQ_MODEL_FALLBACK, max_tokens=max_tokens
+                )
+            
+            # The API itself is failing (e.g. sustained rate limits); retrying
+            # each email alone would only multiply the refused requests
+            if response_text is None:
+                for i in pending:
+                    results[i] = ShipmentExtraction(id=emails[i].id)
+                    self._log(f"{prefixes[i]}Processing {emails[i].id}... ✗ FAILED (all retries exhausted)")
+                return results
+            
+            data = self._extract_json_from_response(response_text)
+            items = data.get('extractions') if data else None
+            by_id = {
+                item.get('id'): item for item in items if isinstance(item, dict)
+            } if isinstance(items, list) else {}
+            
+            # Validate every returned row together; missing or invalid rows stay None
+            returned = [i for i in pending if emails[i].id in by_id]
+            validated = ShipmentExtraction.bulk_from_dicts([
+                self._validate_and_fix_extraction(by_id[emails[i].id], emails[i].id)
+                for i in returned
+            ])
+            for i, extraction in zip(returned, validated):
+                if extraction is None:
+                    continue
+                results[i] = extraction
+                self._store_cached(emails[i], extraction)
+                self._log(f"{prefixes[i]}Processing {emails[i].id}... ✓")
+        
+        # Anything the batched request didn't resolve goes through the single-email path
+        for i, extraction in enumerate(results):
+            if extraction is None:
+                results[i] = await self.extract_single_email(emails[i], prefixes[i])
+        
+        return results
+    
+    async def extract_batch(self, emails: Iterable[EmailInput]) -> List[ShipmentExtraction]:
+        """
+        Extract shipment data from multiple emails concurrently.
+        
+        Emails may be a lazy iterator. Emails with the same subject and body
+        are extracted once and the result is copied to every duplicate ID.
+        Unique emails are grouped MICRO_BATCH_SIZE at a time into one
+        request each, with at most MAX_CONCURRENT_REQUESTS requests in
+        flight; results are returned in input order regardless of
+        completion order.
+        
+        Args:
+            emails: Email inputs (list or iterator)
             
         Returns:
             List of validated extractions
         """
-        extractions = []
-        total = len(emails)
+        total = f"/{len(emails)}" if isinstance(emails, Sized) else ""
         
         print(f"\n{'='*60}")
-        print(f"Starting batch extraction: {total} emails")
+        print(f"Starting batch extraction: {len(emails)} emails" if total else "Starting batch extraction")
         print(f"{'='*60}\n")
         
-        for i, email in enumerate(emails, 1):
-            print(f"[{i}/{total}] ", end="")
-            extraction = self.extract_single_email(email)
-            extractions.append(extraction)
-            
-            # Rate limiting: small delay between requests
-            if i < total:
-                time.sleep(0.5)
+        # Token totals in the summary cover this batch only
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        async def extract_limited(
+            group: List[Tuple[int, EmailInput]]
+        ) -> List[Tuple[int, ShipmentExtraction]]:
+            positions = [position for position, _ in group]
+            prefixes = [f"[{position}{total}] " for position in positions]
+            async with semaphore:
+                results = await self.extract_micro_batch([email for _, email in group], prefixes)
+            return list(zip(positions, results))
+        
+        # Duplicates are held back as (position, first position, email)
+        first_seen: Dict[bytes, int] = {}
+        duplicates: List[Tuple[int, int, EmailInput]] = []
+        
+        def groups():
+            group = []
+            for position, email in enumerate(emails, 1):
+                first = first_seen.setdefault(self._content_hash(email), position)
+                if first != position:
+                    duplicates.append((position, first, email))
+                    continue
+                group.append((position, email))
+                if len(group) == MICRO_BATCH_SIZE:
+                    yield group
+                    group = []
+            if group:
+                yield group
+        
+        grouped = await asyncio.gather(*(extract_limited(group) for group in groups()))
+        by_position = {position: extraction for group in grouped for position, extraction in group}
+        
+        for position, first, email in duplicates:
+            original = by_position[first]
+            by_position[position] = original.model_copy(update={'id': email.id})
+            self._log(f"[{position}{total}] Processing {email.id}... ✓ (duplicate of {original.id})")
+        
+        extractions = [by_position[position] for position in range(1, len(by_position) + 1)]
+        self._flush_log()
         
         print(f"\n{'='*60}")
-        print(f"Batch extraction complete: {total} emails processed")
+        print(f"Batch extraction complete: {len(extractions)} emails processed")
+        if self.prompt_tokens:
+            print(
+                f"Prompt tokens: {self.prompt_tokens} "
+                f"({self.cached_prompt_tokens} served from provider cache)"
+            )
         print(f"{'='*60}\n")
         
         return extractions
 
 
-def load_emails(filepath: str) -> List[EmailInput]:
-    """Load and validate email input data."""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-    return [EmailInput(**email) for email in data]
+def load_emails(filepath: str) -> Iterator[EmailInput]:
+    """Stream and validate email input data one record at a time."""
+    with open(filepath, 'rb') as f:
+        for email in ijson.items(f, 'item'):
+            yield EmailInput(**email)
 
 
 def load_port_references(filepath: str) -> List[Dict[str, str]]:
-    """Load port code reference data."""
-    with open(filepath, 'r') as f:
-        return json.load(f)
+    """
+    Stream port code reference data.
+    
+    Codes and names repeat across rows, so each is interned; rows are plain
+    dicts since the reference file is trusted local data.
+    """
+    with open(filepath, 'rb') as f:
+        return [
+            {'code': sys.intern(port['code']), 'name': sys.intern(port['name'])}
+            for port in ijson.items(f, 'item')
+        ]
 
 
 def save_extractions(extractions: List[ShipmentExtraction], filepath: str):
     """Save extraction results to JSON file."""
-    data = [e.dict() for e in extractions]
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Models are frozen and validated, and every field is a plain str/float/
+    # bool/None, so each __dict__ already is the JSON row
+    rows = [extraction.__dict__ for extraction in extractions]
+    Path(filepath).write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
     print(f"✓ Results saved to: {filepath}")
 
 
@@ -324,9 +649,9 @@ def main():
         print(f"Error: {ports_path} not found")
         return
     
-    # Load data
+    # Load data; every email is needed before dispatch, so materialize them
     print("Loading input data...")
-    emails = load_emails(emails_path)
+    emails = list(load_emails(emails_path))
     port_references = load_port_references(ports_path)
     print(f"✓ Loaded {len(emails)} emails")
     print(f"✓ Loaded {len(port_references)} port references")
@@ -334,8 +659,14 @@ def main():
     # Initialize extractor
     extractor = EmailExtractor(api_key, port_references)
     
-    # Run extraction
-    extractions = extractor.extract_batch(emails)
+    # Run extraction, closing the HTTP connections afterwards
+    async def run() -> List[ShipmentExtraction]:
+        try:
+            return await extractor.extract_batch(emails)
+        finally:
+            await extractor.aclose()
+    
+    extractions = asyncio.run(run())
     
     # Save results
     save_extractions(extractions, output_path)
@@ -343,9 +674,9 @@ def main():
     # Summary
     successful = sum(1 for e in extractions if e.origin_port_code is not None)
     print(f"\nSummary:")
-    print(f"  Total emails: {len(emails)}")
+    print(f"  Total emails: {len(extractions)}")
     print(f"  Successful extractions: {successful}")
-    print(f"  Failed extractions: {len(emails) - successful}")
+    print(f"  Failed extractions: {len(extractions) - successful}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import re
+from typing import Dict, FrozenSet, Optional
+from pathlib import Path
+
+import orjson
+
+
+def cache_key(payload: Dict) -> str:
+    """SHA-256 of the canonical (key-sorted) JSON encoding of payload."""
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class FileCache:
+    """On-disk JSON cache storing one file per key."""
+    
+    def __init__(self, directory: str):
+        """
+        Initialize cache, creating its directory if needed.
+        
+        Args:
+            directory: Folder holding <key>.json entries
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            return orjson.loads(path.read_bytes())
+        except orjson.JSONDecodeError:
+            return None
+    
+    def set(self, key: str, value: Dict):
+        """Store value under key, replacing any existing entry."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(value))
+        os.replace(tmp_path, path)
+
+
+# Filler words that can differ between near-duplicates without changing the
+# extraction. Negations, units and direction words (no, not, non-, kg, lbs,
+# from, to) are deliberately absent, so they always have to match.
+_STOPWORDS = frozenset("""
+    a an the and or of in on at by with is are be been this that these those
+    it its we you i our your us me my please kindly hi hello dear thanks
+    thank regards best as can could would will let know find below above
+""".split())
+
+# Lowercased words and numbers; hyphens, commas and dots inside a token keep
+# it whole, so "non-hazardous" and "5,000" stay distinct from their parts
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.,/][a-z0-9]+)*")
+
+
+def salient_tokens(text: str) -> FrozenSet[str]:
+    """
+    Content words of text plus each adjacent pair of them.
+    
+    Pairs keep local order, so "not dangerous" differs from "dangerous"
+    and "from chennai to busan" differs from the reverse route.
+    """
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+    return frozenset(words).union(f"{a} {b}" for a, b in zip(words, words[1:]))
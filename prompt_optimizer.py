@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Iterative prompt tuning with a no-regression guard.
+
+Each round asks the LLM for revised versions of the best prompt so far,
+runs every candidate over the evaluation emails and scores it against
+ground truth. A candidate is only accepted if it beats the best overall
+accuracy AND every email the best prompt already got fully right is still
+fully right. All scores are appended to prompt_history.json, and the next
+run resumes from the last accepted prompt.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import List, Dict, Optional, Set, Tuple
+from pathlib import Path
+
+import orjson
+
+from evaluate import ExtractionEvaluator
+from extract import (
+    GROQ_MODEL,
+    EmailExtractor,
+    load_emails,
+    load_port_references,
+    save_extractions,
+)
+from schemas import EmailInput
+from prompts import get_current_prompt
+
+
+# Configuration
+OPTIMIZER_ROUNDS = 3
+VARIANTS_PER_ROUND = 3
+VARIANT_TEMPERATURE = 0.7  # Variant generation wants diversity, unlike extraction
+MAX_ERROR_EXAMPLES = 2  # Wrong extractions shown per field in the meta-prompt
+HISTORY_PATH = "prompt_history.json"
+
+
+META_PROMPT = """You are improving a system prompt that extracts shipment data from freight forwarding emails.
+
+CURRENT PROMPT:
+<<<
+{prompt}
+>>>
+
+CURRENT ACCURACY PER FIELD:
+{field_report}
+
+EXAMPLES OF WRONG EXTRACTIONS:
+{error_report}
+
+Write an improved version of the prompt that fixes these errors without breaking what already works.
+- Keep the output JSON structure and field names unchanged
+- Keep the placeholder {{port_reference}} exactly once
+- Keep every other literal brace doubled ({{{{ and }}}}), since the prompt is filled in with str.format
+
+Return ONLY a JSON object: {{"prompt": "<the full improved prompt>"}}"""
+
+
+def _is_usable_template(template: str) -> bool:
+    """True if template keeps the port reference slot and formats cleanly."""
+    if "{port_reference}" not in template:
+        return False
+    try:
+        template.format(port_reference="")
+    except (KeyError, IndexError, ValueError):
+        return False
+    return True
+
+
+def _field_report(results: Dict[str, Dict]) -> str:
+    """Format per-field accuracy for the meta-prompt."""
+    return "\n".join(
+        f"- {field}: {metrics['accuracy']:.1f}%"
+        for field, metrics in results.items()
+        if field != 'overall'
+    )
+
+
+def _error_report(evaluator: ExtractionEvaluator, results: Dict[str, Dict]) -> str:
+    """Format a few wrong extractions per field for the meta-prompt."""
+    lines = []
+    for field in evaluator.EVALUATED_FIELDS:
+        for email_id in results[field]['incorrect_ids'][:MAX_ERROR_EXAMPLES]:
+            expected = evaluator.gt_lookup.get(email_id, {}).get(field)
+            got = evaluator.out_lookup.get(email_id, {}).get(field)
+            lines.append(f"- {email_id} {field}: expected {expected!r}, got {got!r}")
+    return "\n".join(lines) or "(none)"
+
+
+def _load_history(filepath: str) -> List[Dict]:
+    """Load earlier optimizer runs, or an empty history."""
+    path = Path(filepath)
+    if not path.exists():
+        return []
+    return orjson.loads(path.read_bytes())
+
+
+def _save_history(filepath: str, history: List[Dict]):
+    """Write the full optimizer history."""
+    Path(filepath).write_bytes(orjson.dumps(history, option=orjson.OPT_INDENT_2))
+
+
+async def generate_variants(
+    extractor: EmailExtractor,
+    prompt: str,
+    evaluator: ExtractionEvaluator,
+    results: Dict[str, Dict],
+    count: int = VARIANTS_PER_ROUND
+) -> List[str]:
+    """
+    Ask the LLM for revised versions of a prompt, guided by its errors.
+    
+    Args:
+        extractor: Extractor whose client and rate limiter are shared
+        prompt: Prompt template being improved
+        evaluator: Evaluator holding the prompt's extractions
+        results: Results from evaluator.evaluate_all()
+        count: Number of variants requested
+    
+    Returns:
+        Distinct, usable prompt templates (may be fewer than count)
+    """
+    meta_prompt = META_PROMPT.format(
+        prompt=prompt,
+        field_report=_field_report(results),
+        error_report=_error_report(evaluator, results)
+    )
+    
+    async def one_variant() -> Optional[str]:
+        try:
+            await extractor.throttle()
+            response = await extractor.client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": meta_prompt}],
+                temperature=VARIANT_TEMPERATURE,
+                response_format={"type": "json_object"}
+            )
+            variant = orjson.loads(response.choices[0].message.content).get('prompt')
+        except Exception as e:
+            print(f"  ⚠ Variant generation failed: {str(e)[:100]}")
+            return None
+        return variant if isinstance(variant, str) else None
+    
+    variants = await asyncio.gather(*(one_variant() for _ in range(count)))
+    
+    usable = []
+    for variant in variants:
+        if variant and variant != prompt and variant not in usable and _is_usable_template(variant):
+            usable.append(variant)
+    return usable
+
+
+async def score_prompt(
+    extractor: EmailExtractor,
+    prompt: str,
+    emails: List[EmailInput],
+    ground_truth_path: str
+) -> Tuple[ExtractionEvaluator, Dict[str, Dict], Set[str]]:
+    """
+    Run a prompt over the evaluation emails and score it.
+    
+    Args:
+        extractor: Extractor shared by every candidate
+        prompt: Prompt template to score
+        emails: Evaluation emails
+        ground_truth_path: Path to ground truth JSON
+    
+    Returns:
+        Tuple of (evaluator, evaluate_all() results, fully correct email IDs)
+    """
+    extractor.set_prompt(prompt)
+    extractions = await extractor.extract_batch(emails)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "output.json")
+        save_extractions(extractions, output_path)
+        evaluator = ExtractionEvaluator(ground_truth_path, output_path)
+    
+    return evaluator, evaluator.evaluate_all(), evaluator.passing_ids()
+
+
+def _history_entry(
+    round_number: int,
+    prompt: str,
+    results: Dict[str, Dict],
+    regressions: Set[str],
+    accepted: bool
+) -> Dict:
+    """Build one prompt_history.json record."""
+    return {
+        'round': round_number,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'accuracy': results['overall']['accuracy'],
+        'field_accuracy': {
+            field: metrics['accuracy']
+            for field, metrics in results.items()
+            if field != 'overall'
+        },
+        'regressions': sorted(regressions),
+        'accepted': accepted,
+        'prompt': prompt,
+    }
+
+
+async def optimize(
+    api_key: str,
+    emails: List[EmailInput],
+    port_references: List[Dict[str, str]],
+    ground_truth_path: str,
+    rounds: int = OPTIMIZER_ROUNDS,
+    history_path: str = HISTORY_PATH
+) -> str:
+    """
+    Search for a better prompt without regressing on solved emails.
+    
+    Args:
+        api_key: Groq API key
+        emails: Evaluation emails
+        port_references: List of port code mappings
+        ground_truth_path: Path to ground truth JSON
+        rounds: Number of generate-and-score rounds
+        history_path: JSON file recording every scored prompt
+    
+    Returns:
+        Best accepted prompt template
+    """
+    # One extractor for every candidate, so all requests (including variant
+    # generation) share its client and REQUESTS_PER_MINUTE limiter. Candidate
+    # results are one-off, so they are kept out of the on-disk cache.
+    extractor = EmailExtractor(api_key, port_references, cache_dir=None)
+    try:
+        history = _load_history(history_path)
+        accepted = [entry for entry in history if entry['accepted']]
+        best_prompt = accepted[-1]['prompt'] if accepted else get_current_prompt()
+        
+        # Re-score the starting prompt: the model or data may have changed since
+        print("Scoring starting prompt...")
+        best_eval, best_results, best_passing = await score_prompt(
+            extractor, best_prompt, emails, ground_truth_path
+        )
+        best_accuracy = best_results['overall']['accuracy']
+        history.append(_history_entry(0, best_prompt, best_results, set(), True))
+        _save_history(history_path, history)
+        print(f"✓ Starting accuracy: {best_accuracy:.2f}% ({len(best_passing)} emails fully correct)")
+        
+        for round_number in range(1, rounds + 1):
+            print(f"\n{'='*60}")
+            print(f"Round {round_number}/{rounds}")
+            print(f"{'='*60}")
+            
+            candidates = await generate_variants(extractor, best_prompt, best_eval, best_results)
+            print(f"✓ Generated {len(candidates)} usable variants")
+            
+            winner = None
+            winner_accuracy = best_accuracy
+            for i, candidate in enumerate(candidates, 1):
+                evaluator, results, passing = await score_prompt(
+                    extractor, candidate, emails, ground_truth_path
+                )
+                accuracy = results['overall']['accuracy']
+                
+                # No-regression rule: every email solved by the best prompt must stay solved
+                regressions = best_passing - passing
+                status = f"✗ regresses {len(regressions)} emails" if regressions else "✓ no regressions"
+                print(f"  Variant {i}: {accuracy:.2f}% {status}")
+                
+                history.append(_history_entry(round_number, candidate, results, regressions, False))
+                if not regressions and accuracy > winner_accuracy:
+                    winner = (len(history) - 1, candidate, evaluator, results, passing)
+                    winner_accuracy = accuracy
+            
+            if winner is not None:
+                index, best_prompt, best_eval, best_results, best_passing = winner
+                best_accuracy = winner_accuracy
+                history[index]['accepted'] = True
+                print(f"✓ Accepted variant at {best_accuracy:.2f}%")
+            else:
+                print("  No variant improved without regressions; keeping current best")
+            
+            _save_history(history_path, history)
+        
+        print(f"\n✓ Best accuracy: {best_accuracy:.2f}% (history saved to: {history_path})")
+        return best_prompt
+    
+    finally:
+        await extractor.aclose()
+
+
+def main():
+    """Main execution function."""
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key:
+        print("Error: GROQ_API_KEY environment variable not set")
+        print("Please set it using: export GROQ_API_KEY='your-api-key'")
+        return
+    
+    emails_path = "emails_input.json"
+    ports_path = "port_codes_reference.json"
+    ground_truth_path = "ground_truth.json"
+    
+    for path in (emails_path, ports_path, ground_truth_path):
+        if not Path(path).exists():
+            print(f"Error: {path} not found")
+            return
+    
+    # Every candidate runs over the same emails, so materialize them once
+    emails = list(load_emails(emails_path))
+    port_references = load_port_references(ports_path)
+    
+    asyncio.run(optimize(api_key, emails, port_references, ground_truth_path))
+
+
+if __name__ == "__main__":
+    main()
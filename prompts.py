@@ -1,6 +1,7 @@
 
 import json
-from typing import List, Dict
+import sys
+from typing import List, Dict, Tuple
 
 
 # ============================================================================
@@ -96,6 +97,8 @@ Extract and return ONLY valid JSON:
 # - Added unit conversion rules
 # - Added port name matching strategy
 # - Added handling of common abbreviations
+# - Split into a static system prompt (rules + port reference) and a small
+#   per-email user message so the shared prefix is identical on every call
 # ============================================================================
 
 PROMPT_V3 = """You are an expert AI assistant extracting structured shipment data from freight forwarding emails.
@@ -142,10 +145,7 @@ CRITICAL BUSINESS RULES:
 PORT CODE REFERENCE:
 {port_reference}
 
-Email Subject: {subject}
-Email Body: {body}
-
-Return ONLY valid JSON (no markdown, no explanations):
+For each email you receive, return ONLY valid JSON (no markdown, no explanations):
 {{
     "product_line": "pl_sea_import_lcl",
     "origin_port_code": "HKHKG",
@@ -165,8 +165,30 @@ def get_current_prompt() -> str:
     return PROMPT_V3
 
 
+EMAIL_TEMPLATE = """Email Subject: {subject}
+Email Body: {body}"""
+
+
+BATCH_EMAIL_TEMPLATE = """Extract shipment data from EACH of the following emails independently, applying all rules to each one.
+
+Return ONLY a JSON object of the form {{"extractions": [...]}} with exactly one object per email, in the same order. Each object must include the email's "id" plus every field shown in the JSON structure above.
+
+Emails:
+{emails}"""
+
+
 def format_prompt(prompt_template: str, subject: str, body: str, port_reference: str) -> str:
-    """Format prompt with email data and port reference."""
+    """
+    Format a single-message prompt (PROMPT_V1, PROMPT_V2) with email data and port reference.
+    
+    PROMPT_V3 and later are system prompts without the email; use
+    format_system_prompt and format_user_prompt for those.
+    
+    Raises:
+        ValueError: If prompt_template has no {subject} or {body} placeholder
+    """
+    if "{subject}" not in prompt_template or "{body}" not in prompt_template:
+        raise ValueError("Prompt template has no {subject}/{body} slots; use format_system_prompt")
     return prompt_template.format(
         subject=subject,
         body=body,
@@ -174,30 +196,64 @@ def format_prompt(prompt_template: str, subject: str, body: str, port_reference:
     )
 
 
-def get_port_reference_text(ports: List[Dict[str, str]], max_ports: int = 30) -> str:
+def format_system_prompt(prompt_template: str, port_reference: str) -> str:
+    """Format the static system prompt shared by every email."""
+    return prompt_template.format(port_reference=port_reference)
+
+
+def format_user_prompt(subject: str, body: str) -> str:
+    """Format the per-email user message."""
+    return EMAIL_TEMPLATE.format(subject=subject, body=body)
+
+
+def format_batch_user_prompt(emails: List[Dict[str, str]]) -> str:
+    """Format a user message carrying several emails (id, subject, body)."""
+    return BATCH_EMAIL_TEMPLATE.format(
+        emails=json.dumps(emails, ensure_ascii=False, indent=2)
+    )
+
+
+def prepare_ports(
+    ports: List[Dict[str, str]],
+    max_ports: int = 30
+) -> Tuple[Dict[str, str], Dict[str, str], str]:
     """
-    Format port reference for inclusion in prompt.
-    Limits to most common ports to save tokens.
+    Build the port lookups and the prompt reference text in one pass.
+    
+    Returns:
+        Tuple of (code -> canonical name, casefolded name -> code,
+        formatted reference text). The first name listed for a code is
+        treated as canonical, and the first code listed for a name wins.
     """
-    # Group by code to show variations
+    # Group by code to show variations; codes and names are short strings
+    # repeated across rows, so intern them for compact, pointer-equal keys
     port_map = {}
+    code_by_name = {}
     for port in ports:
-        code = port['code']
-        name = port['name']
-        if code not in port_map:
-            port_map[code] = []
-        if name not in port_map[code]:
-            port_map[code].append(name)
+        code = sys.intern(port['code'])
+        name = sys.intern(port['name'])
+        names = port_map.setdefault(code, [])
+        if name not in names:
+            names.append(name)
+        code_by_name.setdefault(name.casefold(), code)
     
-    # Format as readable list
-    lines = []
-    for code, names in sorted(port_map.items())[:max_ports]:
-        if len(names) == 1:
-            lines.append(f"- {code}: {names[0]}")
-        else:
-            lines.append(f"- {code}: {', '.join(names)}")
+    lookup = {code: names[0] for code, names in port_map.items()}
     
-    return "\n".join(lines)
+    # Format as readable list, limited to save tokens
+    lines = [
+        f"- {code}: {', '.join(names)}"
+        for code, names in sorted(port_map.items())[:max_ports]
+    ]
+    
+    return lookup, code_by_name, "\n".join(lines)
+
+
+def get_port_reference_text(ports: List[Dict[str, str]], max_ports: int = 30) -> str:
+    """
+    Format port reference for inclusion in prompt.
+    Limits to most common ports to save tokens.
+    """
+    return prepare_ports(ports, max_ports)[2]
 
 
 # ============================================================================
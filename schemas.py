@@ -1,9 +1,11 @@
-from typing import Optional
-from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, model_validator
 
 
 class EmailInput(BaseModel):
     """Schema for input email data."""
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True)
+    
     id: str
     subject: str
     body: str
@@ -14,6 +16,8 @@ class EmailInput(BaseModel):
 
 class ShipmentExtraction(BaseModel):
     """Schema for extracted shipment details."""
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True)
+    
     id: str
     product_line: Optional[str] = Field(
         None,
@@ -52,29 +56,57 @@ class ShipmentExtraction(BaseModel):
         description="Whether cargo contains dangerous goods"
     )
 
-    @validator('cargo_weight_kg', 'cargo_cbm')
-    def round_to_two_decimals(cls, v):
-        """Round numeric fields to 2 decimal places."""
-        if v is not None:
-            return round(v, 2)
-        return v
+    @model_validator(mode='after')
+    def _finalize(self):
+        """Round weight/CBM to 2 decimals, reject negatives, uppercase incoterm."""
+        # The model is frozen, so normalized values bypass __setattr__
+        if self.cargo_weight_kg is not None:
+            object.__setattr__(self, 'cargo_weight_kg', round(self.cargo_weight_kg, 2))
+            if self.cargo_weight_kg < 0:
+                raise ValueError("Weight and CBM must be positive")
+        if self.cargo_cbm is not None:
+            object.__setattr__(self, 'cargo_cbm', round(self.cargo_cbm, 2))
+            if self.cargo_cbm < 0:
+                raise ValueError("Weight and CBM must be positive")
+        if self.incoterm is not None:
+            object.__setattr__(self, 'incoterm', self.incoterm.upper())
+        return self
 
-    @validator('cargo_weight_kg', 'cargo_cbm')
-    def validate_positive_or_null(cls, v):
-        """Ensure weight and CBM are positive or null."""
-        if v is not None and v < 0:
-            raise ValueError("Weight and CBM must be positive")
-        return v
+    @classmethod
+    def bulk_from_dicts(cls, rows: List[Dict]) -> List[Optional['ShipmentExtraction']]:
+        """
+        Validate a batch of extraction dicts in a single pydantic-core call.
+        
+        If any row is invalid, rows are re-validated one at a time so the
+        others are kept.
+        
+        Args:
+            rows: Extraction dicts, e.g. parsed LLM output
+            
+        Returns:
+            Extractions in input order, None where a row fails validation
+        """
+        try:
+            return _EXTRACTION_LIST_ADAPTER.validate_python(rows)
+        except ValidationError:
+            pass
+        
+        results = []
+        for row in rows:
+            try:
+                results.append(cls.model_validate(row))
+            except ValidationError:
+                results.append(None)
+        return results
 
-    @validator('incoterm')
-    def normalize_incoterm(cls, v):
-        """Normalize incoterm to uppercase."""
-        if v is not None:
-            return v.upper()
-        return v
+
+# Validates a whole list of extractions without a Python-level loop
+_EXTRACTION_LIST_ADAPTER = TypeAdapter(List[ShipmentExtraction])
 
 
 class PortReference(BaseModel):
     """Schema for port code reference data."""
+    model_config = ConfigDict(frozen=True, extra='ignore', str_strip_whitespace=True)
+    
     code: str
-    name: str
\ No newline at end of file
+    name: str